@@ -19,10 +19,11 @@ import random
 import signal
 
 import requests
+from requests.adapters import HTTPAdapter
 from ducktape.errors import DucktapeError
 from ducktape.services.service import Service
 from ducktape.utils.util import wait_until
-from kafkatest.utils.util import retry_on_exception
+from kafkatest.utils.util import retry_on_exception, run_in_parallel
 
 from kafkatest.directory_layout.kafka_path import KafkaPathResolverMixin
 
@@ -39,6 +40,10 @@ class ConnectServiceBase(KafkaPathResolverMixin, Service):
     STDERR_FILE = os.path.join(PERSISTENT_ROOT, "connect.stderr")
     LOG4J_CONFIG_FILE = os.path.join(PERSISTENT_ROOT, "connect-log4j.properties")
     PID_FILE = os.path.join(PERSISTENT_ROOT, "connect.pid")
+    # Per-request timeout for REST calls, so a hung worker fails the call instead of blocking the test. This must exceed
+    # the worker's own 90s ConnectorsResource.REQUEST_TIMEOUT_MS so slow forwarded or mid-rebalance requests still get
+    # the worker's retryable error response rather than a client-side timeout.
+    REST_TIMEOUT_SEC = 120
 
     logs = {
         "connect_log": {
@@ -57,6 +62,7 @@ class ConnectServiceBase(KafkaPathResolverMixin, Service):
         self.kafka = kafka
         self.security_config = kafka.security_config.client_config()
         self.files = files
+        self._session = None
 
     def pids(self, node):
         """Return process ids for Kafka Connect processes."""
@@ -87,6 +93,7 @@ class ConnectServiceBase(KafkaPathResolverMixin, Service):
                 wait_until(lambda: not node.account.alive(pid), timeout_sec=60, err_msg="Kafka Connect process on " + str(node.account) + " took too long to exit")
 
         node.account.ssh("rm -f " + self.PID_FILE, allow_fail=False)
+        self._close_http_session()
 
     def restart(self, clean_shutdown=True):
         # We don't want to do any clean up here, just restart the process.
@@ -99,6 +106,7 @@ class ConnectServiceBase(KafkaPathResolverMixin, Service):
         self.start_node(node)
 
     def clean_node(self, node):
+        self._close_http_session()
         node.account.kill_process("connect", clean_shutdown=False, allow_fail=True)
         self.security_config.clean_node(node)
         node.account.ssh("rm -rf " + " ".join([self.CONFIG_FILE, self.LOG4J_CONFIG_FILE, self.PID_FILE, self.LOG_FILE, self.STDOUT_FILE, self.STDERR_FILE] + self.config_filenames() + self.files), allow_fail=False)
@@ -106,9 +114,37 @@ class ConnectServiceBase(KafkaPathResolverMixin, Service):
     def config_filenames(self):
         return [os.path.join(self.PERSISTENT_ROOT, "connect-connector-" + str(idx) + ".properties") for idx, template in enumerate(self.connector_config_templates or [])]
 
+    def wait_for_rest_ready(self, node=None, timeout_sec=30):
+        """
+        Wait until the worker on the given node, or on every node if none is given, can serve connector requests. The REST
+        server is already up once start() returns, so this lists connectors, which only succeeds once the worker has
+        joined the group and read the latest configs.
+        """
+        for n in ([node] if node is not None else self.nodes):
+            wait_until(lambda: self._rest_ready(n), timeout_sec=timeout_sec, backoff_sec=.5,
+                       err_msg="Kafka Connect worker on " + str(n.account) + " did not become ready to serve REST requests")
+
     def list_connectors(self, node=None, retries=0, retry_backoff=.01):
         return self._rest_with_retry('/connectors', node=node, retries=retries, retry_backoff=retry_backoff)
 
+    def get_connectors_expanded(self, names, node=None, retries=0, retry_backoff=.01):
+        """
+        Return a dict mapping each of the named connectors to its 'info', 'config' and 'tasks', as returned by the
+        corresponding REST endpoints. This version of the REST API has no ?expand= support on /connectors, so the
+        per-connector requests are issued concurrently instead to avoid paying for each round trip in turn. They do not
+        use the shared session, which is not safe to use from multiple threads, so each request opens its own connection.
+        """
+        requests_to_issue = [(name, key, path) for name in names for key, path in
+                             [('info', '/connectors/' + name), ('config', '/connectors/' + name + '/config'),
+                              ('tasks', '/connectors/' + name + '/tasks')]]
+        responses = run_in_parallel(lambda req: self._rest_with_retry(req[2], node=node, retries=retries, retry_backoff=retry_backoff,
+                                                                      use_session=False),
+                                    requests_to_issue)
+        result = dict((name, {}) for name in names)
+        for (name, key, _), response in zip(requests_to_issue, responses):
+            result[name][key] = response
+        return result
+
     def create_connector(self, config, node=None, retries=0, retry_backoff=.01):
         create_request = {
             'name': config['name'],
@@ -140,14 +176,15 @@ class ConnectServiceBase(KafkaPathResolverMixin, Service):
     def resume_connector(self, name, node=None):
         return self._rest('/connectors/' + name + '/resume', method="PUT")
 
-    def _rest(self, path, body=None, node=None, method="GET"):
+    def _rest(self, path, body=None, node=None, method="GET", use_session=True):
         if node is None:
             node = random.choice(self.nodes)
 
-        meth = getattr(requests, method.lower())
+        # Without the shared session, use the module-level requests functions, which open a fresh connection per call
+        meth = getattr(self._http_session() if use_session else requests, method.lower())
         url = self._base_url(node) + path
         self.logger.debug("Kafka Connect REST request: %s %s %s %s", node.account.hostname, url, method, body)
-        resp = meth(url, json=body)
+        resp = meth(url, json=body, timeout=self.REST_TIMEOUT_SEC)
         self.logger.debug("%s %s response: %d", url, method, resp.status_code)
         if resp.status_code > 400:
             raise ConnectRestError(resp.status_code, resp.text, resp.url)
@@ -156,8 +193,31 @@ class ConnectServiceBase(KafkaPathResolverMixin, Service):
         else:
             return resp.json()
 
-    def _rest_with_retry(self, path, body=None, node=None, method="GET", retries=0, retry_backoff=.01):
-        return retry_on_exception(lambda: self._rest(path, body, node, method), ConnectRestError, retries, retry_backoff)
+    def _rest_ready(self, node):
+        try:
+            self._rest('/connectors', node=node)
+            return True
+        except (ConnectRestError, requests.exceptions.RequestException):
+            return False
+
+    def _http_session(self):
+        """Return the HTTP session shared by all REST calls so connections to the workers are kept alive and reused."""
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def _close_http_session(self):
+        """Close the shared HTTP session, dropping its pooled connections. A new one is created on the next REST call."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _rest_with_retry(self, path, body=None, node=None, method="GET", retries=0, retry_backoff=.01, use_session=True):
+        return retry_on_exception(lambda: self._rest(path, body, node, method, use_session), ConnectRestError, retries, retry_backoff)
 
     def _base_url(self, node):
         return 'http://' + node.account.externally_routable_ip + ':' + '8083'
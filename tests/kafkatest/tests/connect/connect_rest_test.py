@@ -15,11 +15,14 @@
 
 from kafkatest.tests.kafka_test import KafkaTest
 from kafkatest.services.connect import ConnectDistributedService, ConnectRestError
-from kafkatest.utils.util import retry_on_exception
-from ducktape.utils.util import wait_until
+from kafkatest.utils.util import retry_on_exception, run_in_parallel, wait_until_exponential
+import pipes
 import subprocess
 import json
-import itertools
+import re
+
+# Matches non-comment "key=value" lines of a properties file
+_PROP_LINE = re.compile(r'^\s*([^#=\s][^=]*)=(.*?)\s*$')
 
 
 class ConnectRestApiTest(KafkaTest):
@@ -39,9 +42,9 @@ class ConnectRestApiTest(KafkaTest):
     # Since tasks can be assigned to any node and we're testing with files, we need to make sure the content is the same
     # across all nodes.
     INPUT_LIST = ["foo", "bar", "baz"]
-    INPUTS = "\n".join(INPUT_LIST) + "\n"
+    INPUT_SET = frozenset(INPUT_LIST)
     LONGER_INPUT_LIST = ["foo", "bar", "baz", "razz", "ma", "tazz"]
-    LONER_INPUTS = "\n".join(LONGER_INPUT_LIST) + "\n"
+    LONGER_INPUT_SET = frozenset(LONGER_INPUT_LIST)
 
     SCHEMA = { "type": "string", "optional": False }
 
@@ -51,6 +54,10 @@ class ConnectRestApiTest(KafkaTest):
         })
 
         self.cc = ConnectDistributedService(test_context, 2, self.kafka, [self.INPUT_FILE, self.INPUT_FILE2, self.OUTPUT_FILE])
+        # (hostname, file) -> number of bytes already consumed, see new_file_lines
+        self._file_offsets = {}
+        # Output lines seen since the last reset, accumulated across validate_output polls
+        self._accum_output = set()
 
     def test_rest_api(self):
         # Template parameters
@@ -61,50 +68,57 @@ class ConnectRestApiTest(KafkaTest):
         self.cc.set_configs(lambda node: self.render("connect-distributed.properties", node=node))
 
         self.cc.start()
+        self.cc.wait_for_rest_ready(timeout_sec=120)
 
         assert self.cc.list_connectors() == []
 
         self.logger.info("Creating connectors")
         source_connector_props = self.render("connect-file-source.properties")
         sink_connector_props = self.render("connect-file-sink.properties")
-        for connector_props in [source_connector_props, sink_connector_props]:
-            connector_config = self._config_dict_from_props(connector_props)
+        source_config_dict = self._config_dict_from_props(source_connector_props)
+        sink_config_dict = self._config_dict_from_props(sink_connector_props)
+        for connector_config in [source_config_dict, sink_config_dict]:
             self.cc.create_connector(connector_config, retries=120, retry_backoff=1)
 
         # We should see the connectors appear
-        wait_until(lambda: set(self.cc.list_connectors(retries=5, retry_backoff=1)) == set(["local-file-source", "local-file-sink"]),
-                   timeout_sec=10, err_msg="Connectors that were just created did not appear in connector listing")
+        expected_connectors = set(["local-file-source", "local-file-sink"])
+        if set(self.cc.list_connectors(retries=5, retry_backoff=1)) != expected_connectors:
+            wait_until_exponential(lambda: set(self.cc.list_connectors(retries=5, retry_backoff=1)) == expected_connectors,
+                                   timeout_sec=10, err_msg="Connectors that were just created did not appear in connector listing")
 
         # We'll only do very simple validation that the connectors and tasks really ran.
-        for node in self.cc.nodes:
-            node.account.ssh("echo -e -n " + repr(self.INPUTS) + " >> " + self.INPUT_FILE)
-        wait_until(lambda: self.validate_output(self.INPUT_LIST), timeout_sec=120, err_msg="Data added to input file was not seen in the output file in a reasonable amount of time.")
+        cmd = self._append_lines_cmd(self.INPUT_LIST, self.INPUT_FILE)
+        run_in_parallel(lambda node: node.account.ssh(cmd), self.cc.nodes)
+        self._accum_output = set()
+        wait_until_exponential(lambda: self.validate_output(self.INPUT_SET), timeout_sec=120, err_msg="Data added to input file was not seen in the output file in a reasonable amount of time.")
+        assert self._accum_output == self.INPUT_SET, "Output file contained unexpected records: " + str(sorted(self._accum_output - self.INPUT_SET))
 
         # Trying to create the same connector again should cause an error
         try:
-            self.cc.create_connector(self._config_dict_from_props(source_connector_props))
+            self.cc.create_connector(source_config_dict, retries=0, retry_backoff=0)
             assert False, "creating the same connector should have caused a conflict"
-        except ConnectRestError:
-            pass # expected
+        except ConnectRestError as e:
+            assert e.status == 409, "creating the same connector should have returned 409 but returned " + str(e.status)
 
         # Validate that we can get info about connectors
+        all_info = self.cc.get_connectors_expanded(["local-file-source", "local-file-sink"], retries=5, retry_backoff=1)
         expected_source_info = {
             'name': 'local-file-source',
-            'config': self._config_dict_from_props(source_connector_props),
+            'config': source_config_dict,
             'tasks': [{ 'connector': 'local-file-source', 'task': 0 }]
         }
-        source_info = self.cc.get_connector("local-file-source")
+        source_info = all_info['local-file-source']['info']
         assert expected_source_info == source_info, "Incorrect info:" + json.dumps(source_info)
-        source_config = self.cc.get_connector_config("local-file-source")
+        source_config = all_info['local-file-source']['config']
         assert expected_source_info['config'] == source_config, "Incorrect config: " + json.dumps(source_config)
         expected_sink_info = {
             'name': 'local-file-sink',
-            'config': self._config_dict_from_props(sink_connector_props),
+            'config': sink_config_dict,
             'tasks': [{'connector': 'local-file-sink', 'task': 0 }]
         }
-        sink_info = self.cc.get_connector("local-file-sink")
+        sink_info = all_info['local-file-sink']['info']
         assert expected_sink_info == sink_info, "Incorrect info:" + json.dumps(sink_info)
-        sink_config = self.cc.get_connector_config("local-file-sink")
+        sink_config = all_info['local-file-sink']['config']
         assert expected_sink_info['config'] == sink_config, "Incorrect config: " + json.dumps(sink_config)
 
         # Validate that we can get info about tasks. This info should definitely be available now without waiting since
@@ -118,7 +132,7 @@ class ConnectRestApiTest(KafkaTest):
                 'topic': self.TOPIC
             }
         }]
-        source_task_info = self.cc.get_connector_tasks("local-file-source")
+        source_task_info = all_info['local-file-source']['tasks']
         assert expected_source_task_info == source_task_info, "Incorrect info:" + json.dumps(source_task_info)
         expected_sink_task_info = [{
             'id': {'connector': 'local-file-sink', 'task': 0},
@@ -128,39 +142,66 @@ class ConnectRestApiTest(KafkaTest):
                 'topics': self.TOPIC
             }
         }]
-        sink_task_info = self.cc.get_connector_tasks("local-file-sink")
+        sink_task_info = all_info['local-file-sink']['tasks']
         assert expected_sink_task_info == sink_task_info, "Incorrect info:" + json.dumps(sink_task_info)
 
-        file_source_config = self._config_dict_from_props(source_connector_props)
+        file_source_config = dict(source_config_dict)
         file_source_config['file'] = self.INPUT_FILE2
         self.cc.set_connector_config("local-file-source", file_source_config)
 
         # We should also be able to verify that the modified configs caused the tasks to move to the new file and pick up
         # more data.
-        for node in self.cc.nodes:
-            node.account.ssh("echo -e -n " + repr(self.LONER_INPUTS) + " >> " + self.INPUT_FILE2)
-        wait_until(lambda: self.validate_output(self.LONGER_INPUT_LIST), timeout_sec=120, err_msg="Data added to input file was not seen in the output file in a reasonable amount of time.")
-
-        self.cc.delete_connector("local-file-source", retries=120, retry_backoff=1)
-        self.cc.delete_connector("local-file-sink", retries=120, retry_backoff=1)
-        wait_until(lambda: len(self.cc.list_connectors(retries=5, retry_backoff=1)) == 0, timeout_sec=10, err_msg="Deleted connectors did not disappear from REST listing")
-
-    def validate_output(self, input):
-        input_set = set(input)
+        cmd = self._append_lines_cmd(self.LONGER_INPUT_LIST, self.INPUT_FILE2)
+        run_in_parallel(lambda node: node.account.ssh(cmd), self.cc.nodes)
+        self._accum_output = set()
+        wait_until_exponential(lambda: self.validate_output(self.LONGER_INPUT_SET), timeout_sec=120, err_msg="Data added to input file was not seen in the output file in a reasonable amount of time.")
+        assert self._accum_output == self.LONGER_INPUT_SET, "Output file contained unexpected records: " + str(sorted(self._accum_output - self.LONGER_INPUT_SET))
+
+        self.cc.delete_connector("local-file-source", retries=5, retry_backoff=1)
+        self.cc.delete_connector("local-file-sink", retries=5, retry_backoff=1)
+        if len(self.cc.list_connectors(retries=5, retry_backoff=1)) != 0:
+            wait_until_exponential(lambda: len(self.cc.list_connectors(retries=5, retry_backoff=1)) == 0, timeout_sec=10,
+                                   err_msg="Deleted connectors did not disappear from REST listing")
+
+    def validate_output(self, input_set):
         # Output needs to be collected from all nodes because we can't be sure where the tasks will be scheduled.
-        output_set = set(itertools.chain(*[
-            [line.strip() for line in self.file_contents(node, self.OUTPUT_FILE)] for node in self.cc.nodes
-            ]))
-        return input_set == output_set
-
-    def file_contents(self, node, file):
+        for lines in run_in_parallel(lambda node: self.new_file_lines(node, self.OUTPUT_FILE), self.cc.nodes):
+            self._accum_output.update(lines)
+        return input_set.issubset(self._accum_output)
+
+    def new_file_lines(self, node, file):
+        """
+        Return the set of stripped lines appended to the given file on the node since the last call. validate_output is
+        polled repeatedly, so only the bytes past the previously consumed offset are read, and nothing is read at all if
+        the file size is unchanged. A trailing partial line is left to be read once it is complete.
+        """
+        key = (node.account.hostname, file)
+        offset = self._file_offsets.get(key, 0)
         try:
-            # Convert to a list here or the CalledProcessError may be returned during a call to the generator instead of
-            # immediately
-            return list(node.account.ssh_capture("cat " + file))
-        except subprocess.CalledProcessError:
-            return []
+            # ssh_capture merges ssh's own stderr (e.g. host key warnings, printed before the command's output) into
+            # what it returns, so take the size from the last line and only trust the bytes stat reported below
+            size = int(list(node.account.ssh_capture("stat -c %s " + file + " 2>/dev/null"))[-1])
+            if size < offset:
+                # The file was truncated or replaced, start over
+                offset = 0
+            if size == offset:
+                return set()
+            expected = size - offset
+            # Join into a string here so the generator is fully consumed inside the try; otherwise the
+            # CalledProcessError may be raised later during iteration instead of immediately
+            data = "".join(node.account.ssh_capture("tail -c +%d %s 2>/dev/null | head -c %d" % (offset + 1, file, expected)))
+        except (subprocess.CalledProcessError, IndexError, ValueError):
+            # Missing file, no output from stat or a stray ssh warning line: treat it as no new data yet
+            return set()
+        chunk = data[-expected:]
+        consumed = chunk.rfind("\n") + 1
+        self._file_offsets[key] = offset + consumed
+        return set(line.strip() for line in chunk[:consumed].splitlines())
+
+    def _append_lines_cmd(self, lines, file):
+        """Return a shell command appending each of the lines to file. printf does no escape processing of its arguments."""
+        return "printf '%s\\n' " + " ".join(pipes.quote(line) for line in lines) + " >> " + file
 
     def _config_dict_from_props(self, connector_props):
-        return dict([line.strip().split('=', 1) for line in connector_props.split('\n') if line.strip() and not line.strip().startswith('#')])
+        return dict(m.groups() for m in (_PROP_LINE.match(line) for line in connector_props.splitlines()) if m)
 
@@ -13,7 +13,9 @@
 # limitations under the License.
 
 from kafkatest import __version__ as __kafkatest_version__
+from ducktape.errors import TimeoutError
 
+from multiprocessing.pool import ThreadPool
 import re
 import time
 
@@ -83,3 +85,33 @@ def retry_on_exception(fun, exception, retries, retry_backoff=.01):
             exception_to_throw = e
             time.sleep(retry_backoff)
     raise exception_to_throw
+
+
+def wait_until_exponential(condition, timeout_sec, initial_backoff_sec=1, max_backoff_sec=10, err_msg=""):
+    """Like ducktape's wait_until, but the backoff doubles after each failed check, up to max_backoff_sec.
+
+    Useful when each check is an expensive SSH or REST round trip, so polling at a fixed short interval is wasteful.
+    """
+    deadline = time.time() + timeout_sec
+    attempt = 0
+    while not condition():
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError(err_msg)
+        time.sleep(min(max_backoff_sec, initial_backoff_sec * 2 ** attempt, remaining))
+        attempt += 1
+
+
+def run_in_parallel(fun, items):
+    """Apply fun to each item concurrently, one thread per item, and return the results in the order of items.
+
+    Meant for fanning out I/O-bound calls such as per-node SSH commands or REST requests.
+    """
+    if not items:
+        return []
+    pool = ThreadPool(len(items))
+    try:
+        return pool.map(fun, items)
+    finally:
+        pool.close()
+        pool.join()